@@ -19,13 +19,14 @@ Usage:
 Requires:
   pip install google-genai playwright
   playwright install chromium
+  pip install h2   # optional: HTTP/2 for the Gemini connection (not with aiohttp)
 """
 
 import os
 import sys
-import time
 import argparse
 import asyncio
+import importlib.util
 
 from google import genai
 from google.genai import types
@@ -39,6 +40,32 @@ MODEL = "gemini-2.5-computer-use-preview-10-2025"
 SCREEN_WIDTH = 1440
 SCREEN_HEIGHT = 900
 MAX_TURNS = 25
+SCREENSHOT_QUALITY = 60  # JPEG quality for screenshots sent to the model
+KEEP_SCREENSHOTS = 3  # older screenshots in the history are replaced with a placeholder
+CACHE_TTL = "1800s"  # lifetime of the server-side cached task prefix
+
+# Actions that load a new document; the post-turn wait only needs the DOM
+NAVIGATION_ACTIONS = {"navigate", "go_back", "go_forward", "search"}
+# Actions whose effects (navigation, re-render) start after the call returns
+INPUT_ACTIONS = {"click_at", "type_text_at", "key_combination", "drag_and_drop"}
+INPUT_SETTLE_MS = 500  # how long to let an input action kick off a navigation
+
+
+def make_http_options(api_version=None):
+    """HTTP/2 for the async client's kept-alive connection when h2 is installed.
+
+    google-genai switches its async transport to aiohttp whenever aiohttp is
+    importable; that transport has no HTTP/2 and ignores these args, so they
+    are only set when the SDK uses httpx. httpx's default pool is kept.
+    """
+    client_args = None
+    if importlib.util.find_spec("aiohttp") is None and importlib.util.find_spec("h2") is not None:
+        client_args = {"http2": True}
+    return types.HttpOptions(
+        api_version=api_version,
+        timeout=60_000,
+        async_client_args=client_args,
+    )
 
 
 def make_client(use_vertex=False):
@@ -47,6 +74,7 @@ def make_client(use_vertex=False):
             vertexai=True,
             project=PROJECT,
             location=LOCATION,
+            http_options=make_http_options(),
         )
     else:
         api_key = os.environ.get("GEMINI_API_KEY")
@@ -55,27 +83,47 @@ def make_client(use_vertex=False):
             print("  export GEMINI_API_KEY=your-key")
             sys.exit(1)
         return genai.Client(
-            http_options={"api_version": "v1beta"},
+            http_options=make_http_options(api_version="v1beta"),
             api_key=api_key,
         )
 
 
-def denormalize_x(x, width=SCREEN_WIDTH):
-    return int(x / 1000 * width)
+# Model coordinates are normalized to 0-1000; precompute the pixel scale
+_SX = SCREEN_WIDTH / 1000.0
+_SY = SCREEN_HEIGHT / 1000.0
+
 
+def denormalize(x, y):
+    return int(x * _SX), int(y * _SY)
 
-def denormalize_y(y, height=SCREEN_HEIGHT):
-    return int(y / 1000 * height)
 
+def parse_parts(candidate):
+    """Scan the candidate once: (function_calls, needs_ack, final_text).
 
-def execute_actions(candidate, page):
-    """Execute function calls from model response, return results."""
+    function_calls is a list of (name, args, safety_decision) tuples;
+    final_text is None when the model returned actions.
+    """
+    function_calls = []
+    needs_ack = set()
+    texts = []
+    for p in candidate.content.parts:
+        if p.function_call:
+            args = p.function_call.args or {}
+            sd = args.get("safety_decision", {})
+            if sd.get("decision") == "require_confirmation":
+                needs_ack.add(p.function_call.name)
+            function_calls.append((p.function_call.name, args, sd))
+        elif p.text and not getattr(p, "thought", False):
+            texts.append(p.text)
+    final_text = None if function_calls else " ".join(texts)
+    return function_calls, needs_ack, final_text
+
+
+async def execute_actions(function_calls, page):
+    """Execute parsed function calls from model response, return results."""
     results = []
-    function_calls = [p.function_call for p in candidate.content.parts if p.function_call]
 
-    for fc in function_calls:
-        name = fc.name
-        args = fc.args or {}
+    for name, args, _ in function_calls:
         result = {}
         print(f"  -> {name}({', '.join(f'{k}={v}' for k, v in args.items())})")
 
@@ -83,89 +131,97 @@ def execute_actions(candidate, page):
             if name == "open_web_browser":
                 pass
             elif name == "click_at":
-                x = denormalize_x(args["x"])
-                y = denormalize_y(args["y"])
-                page.mouse.click(x, y)
+                x, y = denormalize(args["x"], args["y"])
+                await page.mouse.click(x, y)
             elif name == "type_text_at":
-                x = denormalize_x(args["x"])
-                y = denormalize_y(args["y"])
-                page.mouse.click(x, y)
-                page.keyboard.press("Meta+A")
-                page.keyboard.press("Backspace")
-                page.keyboard.type(args["text"])
+                x, y = denormalize(args["x"], args["y"])
+                await page.mouse.click(x, y)
+                await page.keyboard.press("Meta+A")
+                await page.keyboard.press("Backspace")
+                await page.keyboard.type(args["text"])
                 if args.get("press_enter", False):
-                    page.keyboard.press("Enter")
+                    await page.keyboard.press("Enter")
             elif name == "navigate":
-                page.goto(args["url"])
+                await page.goto(args["url"])
             elif name == "go_back":
-                page.go_back()
+                await page.go_back()
             elif name == "go_forward":
-                page.go_forward()
+                await page.go_forward()
             elif name == "search":
-                page.goto(f"https://www.google.com/search?q={args.get('query', '')}")
+                await page.goto(f"https://www.google.com/search?q={args.get('query', '')}")
             elif name == "scroll_document":
                 direction = args.get("direction", "down")
                 amount = args.get("amount", 3)
                 delta = 300 * amount if direction == "down" else -300 * amount
-                page.mouse.wheel(0, delta)
+                await page.mouse.wheel(0, delta)
             elif name == "scroll_at":
-                x = denormalize_x(args["x"])
-                y = denormalize_y(args["y"])
+                x, y = denormalize(args["x"], args["y"])
                 direction = args.get("direction", "down")
                 amount = args.get("amount", 3)
                 delta = 300 * amount if direction == "down" else -300 * amount
-                page.mouse.move(x, y)
-                page.mouse.wheel(0, delta)
+                await page.mouse.move(x, y)
+                await page.mouse.wheel(0, delta)
             elif name == "hover_at":
-                x = denormalize_x(args["x"])
-                y = denormalize_y(args["y"])
-                page.mouse.move(x, y)
+                x, y = denormalize(args["x"], args["y"])
+                await page.mouse.move(x, y)
             elif name == "key_combination":
                 keys = args.get("keys", [])
-                page.keyboard.press("+".join(keys))
+                # The model sends one "+"-joined string such as "control+c"
+                if isinstance(keys, str):
+                    keys = keys.split("+")
+                if keys:
+                    # Hold modifiers explicitly rather than having Playwright parse "A+B+C"
+                    *modifiers, key = keys
+                    held = []
+                    try:
+                        for k in modifiers:
+                            await page.keyboard.down(k)
+                            held.append(k)
+                        await page.keyboard.press(key)
+                    finally:
+                        # Release only what went down, even if a later key failed
+                        for k in reversed(held):
+                            await page.keyboard.up(k)
             elif name == "drag_and_drop":
-                sx = denormalize_x(args["start_x"])
-                sy = denormalize_y(args["start_y"])
-                ex = denormalize_x(args["end_x"])
-                ey = denormalize_y(args["end_y"])
-                page.mouse.move(sx, sy)
-                page.mouse.down()
-                page.mouse.move(ex, ey)
-                page.mouse.up()
+                sx, sy = denormalize(args["start_x"], args["start_y"])
+                ex, ey = denormalize(args["end_x"], args["end_y"])
+                await page.mouse.move(sx, sy)
+                await page.mouse.down()
+                await page.mouse.move(ex, ey)
+                await page.mouse.up()
             elif name == "wait_5_seconds":
-                time.sleep(5)
+                await page.wait_for_timeout(5000)
             else:
                 print(f"  !! Unknown action: {name}")
 
-            try:
-                page.wait_for_load_state(timeout=5000)
-            except Exception:
-                pass
-            time.sleep(1)
-
         except Exception as e:
             print(f"  !! Error: {e}")
             result = {"error": str(e)}
 
         results.append((name, result))
+
+    # Let the page settle once after the whole sequence, not after every action.
+    # Full load is awaited in run() while the next model request is in flight.
+    names = {name for name, _ in results}
+    if names & INPUT_ACTIONS and not names & NAVIGATION_ACTIONS:
+        # A click or Enter navigates asynchronously; give it a moment to start
+        # so the screenshot and the URL check in run() see the new page
+        await page.wait_for_timeout(INPUT_SETTLE_MS)
+    if names & (NAVIGATION_ACTIONS | INPUT_ACTIONS):
+        try:
+            await page.wait_for_load_state("domcontentloaded", timeout=1500)
+        except Exception:
+            pass
     return results
 
 
-def build_function_responses(page, results, candidate=None):
-    """Build FunctionResponse parts with a fresh screenshot."""
-    screenshot = page.screenshot(type="png")
-    current_url = page.url
+async def take_screenshot(page):
+    """Capture the viewport as JPEG — far smaller and cheaper to encode than PNG."""
+    return await page.screenshot(type="jpeg", quality=SCREENSHOT_QUALITY, full_page=False)
 
-    # Build a map of which function calls need safety acknowledgement
-    needs_ack = set()
-    if candidate:
-        for p in candidate.content.parts:
-            if p.function_call:
-                args = p.function_call.args or {}
-                sd = args.get("safety_decision", {})
-                if sd.get("decision") == "require_confirmation":
-                    needs_ack.add(p.function_call.name)
 
+def build_function_responses(screenshot, current_url, results, needs_ack=frozenset()):
+    """Build FunctionResponse parts around an already-captured screenshot."""
     parts = []
     for name, result in results:
         # Computer-use model REQUIRES 'url' in every function response
@@ -176,19 +232,65 @@ def build_function_responses(page, results, candidate=None):
         if name in needs_ack:
             output["safety_acknowledgement"] = True
         parts.append(
-            types.Part.from_function_response(
-                name=name,
-                response=output,
+            types.Part(
+                function_response=types.FunctionResponse(
+                    name=name,
+                    response=output,
+                )
             )
         )
     # Append screenshot as the last part
-    parts.append(types.Part.from_bytes(data=screenshot, mime_type="image/png"))
+    parts.append(types.Part(inline_data=types.Blob(data=screenshot, mime_type="image/jpeg")))
     return parts
 
 
-def run(task, start_url="https://www.google.com", headless=False, use_vertex=False):
+def prune_screenshots(contents, keep=KEEP_SCREENSHOTS):
+    """Elide all but the newest `keep` screenshots so per-turn prompt size stays bounded."""
+    seen = 0
+    for content in reversed(contents):
+        if content.role != "user":
+            continue
+        for i, part in enumerate(content.parts):
+            if part.inline_data is None:
+                continue
+            seen += 1
+            if seen > keep:
+                content.parts[i] = types.Part.from_text(text="[prior screenshot elided]")
+
+
+def request_turn(client, contents, config):
+    """Start the next model call in the background and return its task."""
+    return asyncio.create_task(
+        client.aio.models.generate_content(
+            model=MODEL,
+            contents=list(contents),
+            config=config,
+        )
+    )
+
+
+async def cache_prefix(client, contents, tools):
+    """Cache the stable prefix (tools and the first exchange) server-side.
+
+    Returns None if the model or backend doesn't support explicit caching.
+    """
     try:
-        from playwright.sync_api import sync_playwright
+        return await client.aio.caches.create(
+            model=MODEL,
+            config=types.CreateCachedContentConfig(
+                contents=contents,
+                tools=tools,
+                ttl=CACHE_TTL,
+            ),
+        )
+    except Exception as e:
+        print(f"  (context cache unavailable, sending full history: {e})")
+        return None
+
+
+async def run(task, start_url="https://www.google.com", headless=False, use_vertex=False, use_cache=False):
+    try:
+        from playwright.async_api import async_playwright
     except ImportError:
         print("ERROR: pip install playwright && playwright install chromium")
         sys.exit(1)
@@ -204,87 +306,121 @@ def run(task, start_url="https://www.google.com", headless=False, use_vertex=Fal
     print(f"  Headless: {headless}")
     print()
 
-    pw = sync_playwright().start()
-    browser = pw.chromium.launch(headless=headless)
-    context = browser.new_context(
-        viewport={"width": SCREEN_WIDTH, "height": SCREEN_HEIGHT}
-    )
-    page = context.new_page()
+    async with async_playwright() as pw:
+        browser = await pw.chromium.launch(headless=headless)
+        context = await browser.new_context(
+            viewport={"width": SCREEN_WIDTH, "height": SCREEN_HEIGHT}
+        )
+        page = await context.new_page()
+        response_task = None
+        cache = None
+        cache_task = None
 
-    try:
-        page.goto(start_url)
-        time.sleep(2)
+        try:
+            await page.goto(start_url)
+            await page.wait_for_load_state("domcontentloaded")
 
-        config = types.GenerateContentConfig(
-            tools=[
+            tools = [
                 types.Tool(
                     computer_use=types.ComputerUse(
                         environment=types.Environment.ENVIRONMENT_BROWSER,
                     )
                 )
-            ],
-            # Note: computer-use model does not support thinking config on Vertex AI
-        )
-
-        initial_screenshot = page.screenshot(type="png")
-        contents = [
-            types.Content(
-                role="user",
-                parts=[
-                    types.Part.from_text(text=task),
-                    types.Part.from_bytes(data=initial_screenshot, mime_type="image/png"),
-                ],
-            )
-        ]
+            ]
+
+            initial_screenshot = await take_screenshot(page)
+            contents = [
+                types.Content(
+                    role="user",
+                    parts=[
+                        types.Part.from_text(text=task),
+                        types.Part(inline_data=types.Blob(data=initial_screenshot, mime_type="image/jpeg")),
+                    ],
+                )
+            ]
 
-        for turn in range(MAX_TURNS):
-            print(f"\n--- Turn {turn + 1} ---")
-            response = client.models.generate_content(
-                model=MODEL,
-                contents=contents,
-                config=config,
-            )
+            # Note: computer-use model does not support thinking config on Vertex AI
+            config = types.GenerateContentConfig(tools=tools)
+            prefix = 0
 
-            candidate = response.candidates[0]
-            contents.append(candidate.content)
+            response_task = request_turn(client, contents, config)
+            for turn in range(MAX_TURNS):
+                print(f"\n--- Turn {turn + 1} ---")
+                response = await response_task
 
-            # Check if model returned actions or a final answer
-            has_actions = any(p.function_call for p in candidate.content.parts)
-            if not has_actions:
-                final_text = " ".join(
-                    p.text for p in candidate.content.parts
-                    if hasattr(p, "text") and p.text and not getattr(p, "thought", False)
-                )
-                print(f"\n=== Result ===\n{final_text}")
-                break
+                candidate = response.candidates[0]
+                contents.append(candidate.content)
 
-            # Check for confirmation-required actions
-            for p in candidate.content.parts:
-                if p.function_call and hasattr(p, 'function_call'):
-                    # Safety: check if any action requires confirmation
-                    pass
+                # Check if model returned actions or a final answer
+                function_calls, needs_ack, final_text = parse_parts(candidate)
+                if final_text is not None:
+                    print(f"\n=== Result ===\n{final_text}")
+                    break
 
-            # Check for safety confirmations
-            for p in candidate.content.parts:
-                if p.function_call:
-                    args = p.function_call.args or {}
-                    sd = args.get("safety_decision", {})
+                # Check for safety confirmations
+                for _, _, sd in function_calls:
                     if sd.get("decision") == "require_confirmation":
                         print(f"  !! Safety confirmation required: {sd.get('explanation', 'No explanation')}")
                         print(f"  !! Auto-acknowledging for this session.")
 
-            # Execute actions
-            results = execute_actions(candidate, page)
-            response_parts = build_function_responses(page, results, candidate)
-            contents.append(
-                types.Content(role="user", parts=response_parts)
-            )
-        else:
-            print(f"\n=== Reached max turns ({MAX_TURNS}) ===")
-
-    finally:
-        browser.close()
-        pw.stop()
+                # With --cache, cache the first exchange (task, first screenshot
+                # and the model's reply) while its actions run; later requests
+                # then carry only the turns after it. Off by default: it costs a
+                # round trip and only pays off on long runs with an
+                # implicit-cache miss. Not before turn 1, which would leave that
+                # request with no contents of its own.
+                if use_cache and turn == 0:
+                    cache_task = asyncio.create_task(cache_prefix(client, contents[:2], tools))
+
+                # Execute actions
+                results = await execute_actions(function_calls, page)
+                current_url = page.url
+                response_parts = build_function_responses(
+                    await take_screenshot(page), current_url, results, needs_ack
+                )
+                contents.append(
+                    types.Content(role="user", parts=response_parts)
+                )
+                prune_screenshots(contents)
+                if cache_task is not None:
+                    cache, cache_task = await cache_task, None
+                    if cache is not None:
+                        config = types.GenerateContentConfig(cached_content=cache.name)
+                        prefix = 2
+                if turn + 1 == MAX_TURNS:
+                    continue
+
+                # Send the next turn right away and let the page finish
+                # loading while the model is thinking
+                response_task = request_turn(client, contents[prefix:], config)
+                try:
+                    await page.wait_for_load_state(timeout=2000)
+                except Exception:
+                    pass
+                if page.url != current_url:
+                    # Page navigated under the in-flight request; resend with a fresh view
+                    response_task.cancel()
+                    contents[-1] = types.Content(
+                        role="user",
+                        parts=build_function_responses(
+                            await take_screenshot(page), page.url, results, needs_ack
+                        ),
+                    )
+                    response_task = request_turn(client, contents[prefix:], config)
+            else:
+                print(f"\n=== Reached max turns ({MAX_TURNS}) ===")
+
+        finally:
+            if response_task is not None and not response_task.done():
+                response_task.cancel()
+            if cache_task is not None:
+                cache_task.cancel()
+            if cache is not None:
+                try:
+                    await client.aio.caches.delete(name=cache.name)
+                except Exception:
+                    pass
+            await browser.close()
 
 
 if __name__ == "__main__":
@@ -312,5 +448,16 @@ if __name__ == "__main__":
         default=USE_VERTEX,
         help="Use Vertex AI instead of AI Studio (function responses may not work yet)",
     )
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        help="Cache the task prefix server-side instead of sending it each turn",
+    )
     args = parser.parse_args()
-    run(task=" ".join(args.task), start_url=args.url, headless=args.headless, use_vertex=args.vertex)
+    asyncio.run(run(
+        task=" ".join(args.task),
+        start_url=args.url,
+        headless=args.headless,
+        use_vertex=args.vertex,
+        use_cache=args.cache,
+    ))
@@ -19,8 +19,8 @@ Requires: pip install google-genai opencv-python pyaudio pillow mss
 
 import os
 import asyncio
-import base64
 import io
+import threading
 import traceback
 import argparse
 
@@ -88,6 +88,45 @@ CONFIG = types.LiveConnectConfig(
 pya = pyaudio.PyAudio()
 
 
+# JPEG encoders run on a worker thread; cv2 and PIL release the GIL while
+# resizing and encoding, so the audio tasks keep running.
+
+def _encode_frame(frame):
+    # Shrink to fit 1024x1024 (like PIL's thumbnail), keeping aspect ratio
+    h, w = frame.shape[:2]
+    scale = min(1024 / w, 1024 / h)
+    if scale < 1:
+        frame = cv2.resize(frame, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+
+    # Encode JPEG straight from the BGR frame — no RGB conversion or PIL needed
+    ok, buf = cv2.imencode(".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), 75])
+    if not ok:
+        return None
+
+    mime_type = "image/jpeg"
+    return {"mime_type": mime_type, "data": buf.tobytes()}
+
+
+# Reused JPEG buffer for screen captures (grabs run one at a time)
+_screen_buf = io.BytesIO()
+
+
+def _encode_screen(bgra, size):
+    mime_type = "image/jpeg"
+    # Decode mss's raw BGRA buffer as RGB in one C pass — no PNG round-trip
+    # and no separate channel-swap copy
+    img = PIL.Image.frombuffer("RGB", size, bgra, "raw", "BGRX", 0, 1)
+    img.thumbnail([1024, 1024], reducing_gap=2.0)
+
+    image_io = _screen_buf
+    image_io.seek(0)
+    image_io.truncate()
+    img.save(image_io, format="jpeg", quality=75, optimize=False)
+
+    image_bytes = image_io.getvalue()
+    return {"mime_type": mime_type, "data": image_bytes}
+
+
 class AudioLoop:
     def __init__(self, video_mode=DEFAULT_MODE, use_vertex=False):
         self.video_mode = video_mode
@@ -108,6 +147,10 @@ class AudioLoop:
         self.play_audio_task = None
 
         self.audio_stream = None
+        self.play_stream = None
+        # Held while a speaker write runs on a worker thread, so close_audio
+        # never closes the stream under a blocked Pa_WriteStream
+        self.play_lock = threading.Lock()
 
     async def send_text(self):
         while True:
@@ -120,28 +163,24 @@ class AudioLoop:
             if self.session is not None:
                 await self.session.send(input=text or ".", end_of_turn=True)
 
-    def _get_frame(self, cap):
-        ret, frame = cap.read()
-        if not ret:
-            return None
-        # Convert BGR to RGB (OpenCV captures BGR, PIL expects RGB)
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        img = PIL.Image.fromarray(frame_rgb)
-        img.thumbnail([1024, 1024])
-
-        image_io = io.BytesIO()
-        img.save(image_io, format="jpeg")
-        image_io.seek(0)
-
-        mime_type = "image/jpeg"
-        image_bytes = image_io.read()
-        return {"mime_type": mime_type, "data": base64.b64encode(image_bytes).decode()}
+    def _open_camera(self):
+        cap = cv2.VideoCapture(0)
+        # Ask for compressed MJPG at roughly the size we send, and keep only the
+        # newest frame buffered so each 1 fps read isn't a stale one
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*"MJPG"))
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 1024)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 768)
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return cap
 
     async def get_frames(self):
-        cap = await asyncio.to_thread(cv2.VideoCapture, 0)
+        cap = await asyncio.to_thread(self._open_camera)
 
         while True:
-            frame = await asyncio.to_thread(self._get_frame, cap)
+            ret, raw = await asyncio.to_thread(cap.read)
+            if not ret:
+                break
+            frame = await asyncio.to_thread(_encode_frame, raw)
             if frame is None:
                 break
 
@@ -161,21 +200,12 @@ class AudioLoop:
         monitor = sct.monitors[0]
 
         i = sct.grab(monitor)
-
-        mime_type = "image/jpeg"
-        image_bytes = mss.tools.to_png(i.rgb, i.size)
-        img = PIL.Image.open(io.BytesIO(image_bytes))
-
-        image_io = io.BytesIO()
-        img.save(image_io, format="jpeg")
-        image_io.seek(0)
-
-        image_bytes = image_io.read()
-        return {"mime_type": mime_type, "data": base64.b64encode(image_bytes).decode()}
+        return i.raw, i.size
 
     async def get_screen(self):
         while True:
-            frame = await asyncio.to_thread(self._get_screen)
+            bgra, size = await asyncio.to_thread(self._get_screen)
+            frame = await asyncio.to_thread(_encode_screen, bgra, tuple(size))
             if frame is None:
                 break
 
@@ -185,31 +215,80 @@ class AudioLoop:
                 await self.out_queue.put(frame)
 
     async def send_realtime(self):
+        # Media chunks carry raw bytes (same as the audio path); the SDK
+        # handles wire encoding, so nothing is base64-encoded here.
         while True:
             if self.out_queue is not None:
                 msg = await self.out_queue.get()
                 if self.session is not None:
                     await self.session.send(input=msg)
 
-    async def listen_audio(self):
-        mic_info = pya.get_default_input_device_info()
-        self.audio_stream = await asyncio.to_thread(
-            pya.open,
-            format=FORMAT,
-            channels=CHANNELS,
-            rate=SEND_SAMPLE_RATE,
-            input=True,
-            input_device_index=mic_info["index"],
-            frames_per_buffer=CHUNK_SIZE,
-        )
-        if __debug__:
-            kwargs = {"exception_on_overflow": False}
-        else:
-            kwargs = {}
-        while True:
-            data = await asyncio.to_thread(self.audio_stream.read, CHUNK_SIZE, **kwargs)
+    async def open_audio(self):
+        """Open mic and speaker streams up front so the tasks start streaming at once."""
+        loop = asyncio.get_running_loop()
+
+        def put_audio(msg):
+            # Drop the chunk rather than queue up mic latency behind a slow send
+            try:
+                self.out_queue.put_nowait(msg)
+            except asyncio.QueueFull:
+                pass
+
+        def on_audio(in_data, frame_count, time_info, status):
+            # Runs on PortAudio's thread — hand the chunk over to the event loop
             if self.out_queue is not None:
-                await self.out_queue.put({"data": data, "mime_type": "audio/pcm"})
+                loop.call_soon_threadsafe(
+                    put_audio, {"data": in_data, "mime_type": "audio/pcm"}
+                )
+            return (None, pyaudio.paContinue)
+
+        def open_streams():
+            # PortAudio's open isn't thread-safe, so open one after the other
+            mic_info = pya.get_default_input_device_info()
+            audio_stream = pya.open(
+                format=FORMAT,
+                channels=CHANNELS,
+                rate=SEND_SAMPLE_RATE,
+                input=True,
+                input_device_index=mic_info["index"],
+                frames_per_buffer=CHUNK_SIZE,
+                stream_callback=on_audio,
+                start=False,
+            )
+            try:
+                play_stream = pya.open(
+                    format=FORMAT,
+                    channels=CHANNELS,
+                    rate=RECEIVE_SAMPLE_RATE,
+                    output=True,
+                )
+            except Exception:
+                audio_stream.close()
+                raise
+            return audio_stream, play_stream
+
+        self.audio_stream, self.play_stream = await asyncio.to_thread(open_streams)
+
+    def close_audio(self):
+        # A cancelled play_audio can leave its write running; let it finish
+        with self.play_lock:
+            for stream in (self.audio_stream, self.play_stream):
+                if stream is not None:
+                    stream.close()
+            self.audio_stream = self.play_stream = None
+
+    def _play(self, data):
+        with self.play_lock:
+            if self.play_stream is not None:
+                self.play_stream.write(data)
+
+    async def listen_audio(self):
+        # Mic capture is callback-driven; this task just holds the stream open
+        self.audio_stream.start_stream()
+        try:
+            await asyncio.Future()
+        finally:
+            self.audio_stream.stop_stream()
 
     async def receive_audio(self):
         """Background task to read from the websocket and write pcm chunks to the output queue"""
@@ -228,17 +307,10 @@ class AudioLoop:
                     self.audio_in_queue.get_nowait()
 
     async def play_audio(self):
-        stream = await asyncio.to_thread(
-            pya.open,
-            format=FORMAT,
-            channels=CHANNELS,
-            rate=RECEIVE_SAMPLE_RATE,
-            output=True,
-        )
         while True:
             if self.audio_in_queue is not None:
                 bytestream = await self.audio_in_queue.get()
-                await asyncio.to_thread(stream.write, bytestream)
+                await asyncio.to_thread(self._play, bytestream)
 
     async def run(self):
         backend = f"Vertex AI ({LOCATION})" if self.use_vertex else "AI Studio (API key)"
@@ -250,6 +322,7 @@ class AudioLoop:
         print(f"Type 'q' + Enter to quit.\n")
 
         try:
+            await self.open_audio()
             async with (
                 self.client.aio.live.connect(model=self.model, config=CONFIG) as session,
                 asyncio.TaskGroup() as tg,
@@ -277,9 +350,9 @@ class AudioLoop:
         except asyncio.CancelledError:
             pass
         except ExceptionGroup as EG:
-            if self.audio_stream is not None:
-                self.audio_stream.close()
-                traceback.print_exception(EG)
+            traceback.print_exception(EG)
+        finally:
+            self.close_audio()
 
 
 if __name__ == "__main__":
@@ -13,14 +13,48 @@ Usage:
   python robotics.py                      # interactive mode
   python robotics.py --vertex             # use Vertex AI (when available)
 
+  GEMINI_CACHE=1 python robotics.py "..."  # replay identical prompts from disk
+                                          # (--no-cache to bypass)
+  python robotics.py --sem-cache          # also reuse answers to paraphrased prompts
+
+  GEMINI_DAEMON=1 python robotics.py "..." # route one-shot prompts through a warm
+                                          # background process (autostarted)
+  python robotics.py --daemon             # run that background process yourself
+                                          # (restarts if the GEMINI_* env changes)
+
+  python robotics.py --batch prompts.txt  # one prompt per line, run concurrently
+                                          # (--concurrency N in flight, default 8)
+
+Short prompts that need neither search nor spatial reasoning are routed to
+GEMINI_SMALL_MODEL (default gemini-2.5-flash); --force-er disables routing,
+--verbose shows each decision.
+
+Prompts estimated above the model's context window are rejected locally,
+before any upload; --force sends them anyway.
+
 Requires: pip install google-genai
+Semantic cache: pip install fastembed faiss-cpu
+Prompt history + Ctrl-R search: pip install prompt_toolkit (falls back to readline)
+Faster event loop (optional): pip install uvloop
 """
 
 import os
 import sys
-import argparse
-from google import genai
-from google.genai import types
+import atexit
+import stat
+import select
+import signal
+import struct
+import time
+import hashlib
+import functools
+import threading
+from types import SimpleNamespace
+
+# google-genai is imported lazily (make_client / generate_async): loading the
+# SDK costs hundreds of ms, which --help, arg errors and daemon-routed prompts
+# never need to pay. asyncio, sqlite3, json, socket, subprocess and tempfile
+# are likewise imported by the code paths that use them.
 
 # --- Config ---
 PROJECT = os.environ.get("GEMINI_PROJECT", "gcp-virtual-production-lab")
@@ -29,27 +63,407 @@ PROJECT = os.environ.get("GEMINI_PROJECT", "gcp-virtual-production-lab")
 LOCATION = os.environ.get("GEMINI_LOCATION", "global")
 USE_VERTEX = os.environ.get("GEMINI_USE_VERTEX", "").lower() in ("1", "true", "yes")
 MODEL = os.environ.get("GEMINI_ROBOTICS_MODEL", "gemini-robotics-er-1.5-preview")
+MODEL_SMALL = os.environ.get("GEMINI_SMALL_MODEL", "gemini-2.5-flash")
+MODEL_CTX = int(os.environ.get("GEMINI_MAX_PROMPT_TOKENS", "1048576"))  # input token limit
+
+# Router heuristics: prompts at most SMALL_MAX_TOKENS long with none of these
+# keywords go to MODEL_SMALL, without the search tool
+SMALL_MAX_TOKENS = 40
+SEARCH_KEYWORDS = ("search", "latest", "today", "current", "news", "recent", "price", "weather")
+ER_KEYWORDS = (
+    "robot", "grasp", "gripper", "pick", "place", "trajectory", "point",
+    "bounding box", "coordinates", "pose", "scene", "object", "image",
+)
+
+# Sent as system_instruction on every request. Keep it byte-identical across
+# calls (no timestamps or IDs) so the server's implicit prefix cache can match.
+SYSTEM_PREAMBLE = """\
+You are Gemini Robotics-ER, an embodied-reasoning assistant for robotics work.
+Reason about physical scenes, objects, spatial relations, grasps, trajectories
+and multi-step manipulation tasks. Use Google Search when the answer depends on
+current or external facts.
+
+Output conventions:
+- Be concise and concrete; lead with the answer, then the reasoning.
+- Give points as [y, x] and boxes as [ymin, xmin, ymax, xmax], normalized to
+  0-1000, and return them as JSON when asked for coordinates.
+- Break tasks into numbered, executable steps with preconditions and checks.
+- State assumptions and uncertainty explicitly instead of guessing.
+"""
+
+# Sent instead for prompts routed to MODEL_SMALL, which is neither Robotics-ER
+# nor given the search tool. Just as byte-stable.
+SMALL_PREAMBLE = """\
+You are a concise assistant for robotics work. Answer from what you know.
+
+Output conventions:
+- Be concise and concrete; lead with the answer, then the reasoning.
+- State assumptions and uncertainty explicitly instead of guessing.
+"""
+
+USE_CACHE = os.environ.get("GEMINI_CACHE", "").lower() in ("1", "true", "yes")
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "gemini-robotics-er")
+CACHE_TTL = 3600  # seconds
+TOOLS_SIGNATURE = "googleSearch"
+HISTORY_PATH = os.path.join(CACHE_DIR, "history")
+SEM_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+SEM_THRESHOLD = float(os.environ.get("GEMINI_SEM_THRESHOLD", "0.92"))
+SEM_MAX_ENTRIES = 2000  # oldest entries are dropped past this
+SEM_SEARCH_K = 8  # neighbours checked per lookup, so another model's entry can't hide a hit
+
+USE_DAEMON = os.environ.get("GEMINI_DAEMON", "").lower() in ("1", "true", "yes")
+# $XDG_RUNTIME_DIR is already private to the user; otherwise a 0700 directory
+# of our own under /tmp, never a bare socket in the shared /tmp. No uids on
+# Windows (where the daemon isn't available), so --help etc. still work there.
+DAEMON_SOCKET = os.environ.get(
+    "GEMINI_DAEMON_SOCKET",
+    os.path.join(
+        os.environ.get("XDG_RUNTIME_DIR")
+        or (
+            f"/tmp/gemini-robotics-{os.getuid()}"
+            if hasattr(os, "getuid")
+            else os.path.join(CACHE_DIR, "daemon")
+        ),
+        "gemini-robotics.sock",
+    ),
+)
+DAEMON_IDLE_TIMEOUT = 600  # seconds without a request before the daemon exits
+DAEMON_LOG = os.path.join(CACHE_DIR, "daemon.log")  # autostarted daemons' stdout/stderr
+DAEMON_ERROR = b"\0"  # daemon reply: streamed output, then this and an error report
+BATCH_CONCURRENCY = 8  # --batch prompts in flight at once
+WRITE_BATCH_BYTES = 256  # streamed output is written once this much is buffered...
+WRITE_BATCH_SECS = 0.03  # ...or once the oldest buffered byte is this old
+WARM_UP_TIMEOUT = 5.0  # seconds before a stalled warm-up is abandoned
+WARM_UP_WAIT = 0.3  # longest a prompt waits on an unfinished warm-up
 
 
 def make_client(use_vertex=False):
+    """Return the shared client for this backend/config, creating it on first use."""
     if use_vertex:
-        return genai.Client(
-            vertexai=True,
-            project=PROJECT,
-            location=LOCATION,
-        )
+        return _build_client(True, PROJECT, LOCATION, None)
     else:
         api_key = os.environ.get("GEMINI_API_KEY")
         if not api_key:
             print("ERROR: Set GEMINI_API_KEY env var, or use --vertex for Vertex AI auth.")
             print("  export GEMINI_API_KEY=your-key")
             raise SystemExit(1)
+        # Key the cache on a hash so the key itself isn't held in the cache key
+        key_hash = hashlib.sha256(api_key.encode()).hexdigest()
+        return _build_client(False, PROJECT, LOCATION, key_hash)
+
+
+@functools.lru_cache(maxsize=4)
+def _build_client(use_vertex, project, location, api_key_hash):
+    from google import genai
+
+    if use_vertex:
         return genai.Client(
-            api_key=api_key,
+            vertexai=True,
+            project=project,
+            location=location,
+        )
+    return genai.Client(
+        api_key=os.environ["GEMINI_API_KEY"],
+    )
+
+
+make_client.cache_clear = _build_client.cache_clear
+
+
+class ResponseCache:
+    """Exact-match prompt -> response cache in a small SQLite file."""
+
+    def __init__(self, path=None, ttl=CACHE_TTL):
+        import sqlite3
+
+        path = path or os.path.join(CACHE_DIR, "responses.sqlite3")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.ttl = ttl
+        self.db = sqlite3.connect(path)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS responses "
+            "(key TEXT PRIMARY KEY, response TEXT NOT NULL, expires REAL NOT NULL)"
+        )
+
+    @staticmethod
+    def key(model, prompt, tools=TOOLS_SIGNATURE, system=SYSTEM_PREAMBLE):
+        import json
+
+        return hashlib.sha256(json.dumps([model, prompt, tools, system]).encode()).hexdigest()
+
+    def get(self, key):
+        row = self.db.execute(
+            "SELECT response FROM responses WHERE key = ? AND expires > ?",
+            (key, time.time()),
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, response):
+        now = time.time()
+        with self.db:
+            # Expired rows are never read again; drop them so the file stays small
+            self.db.execute("DELETE FROM responses WHERE expires <= ?", (now,))
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?)",
+                (key, response, now + self.ttl),
+            )
+
+
+def _write_atomic(path, data):
+    """Replace `path` with `data` in one step, so readers never see a partial file."""
+    import tempfile
+
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class SemanticCache:
+    """Reuse an earlier answer when a new prompt embeds close to its prompt.
+
+    Embeddings are L2-normalized, so inner product is cosine similarity.
+    The embedding model and index are loaded on first use. Entries expire
+    after ttl seconds like ResponseCache's, and at most max_entries are kept.
+
+    The .json file records a hash of the .faiss file it was saved with; a
+    pair that doesn't match (another process saved in between, or a crash)
+    is discarded on load rather than answering with another prompt's entry.
+    """
+
+    def __init__(self, threshold=SEM_THRESHOLD, path=None, ttl=CACHE_TTL, max_entries=SEM_MAX_ENTRIES):
+        self.threshold = threshold
+        self.path = path or os.path.join(CACHE_DIR, "sem")
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = []  # (model, prompt, response, expires), parallel to the index
+        self._embedder = None
+        self._index = None
+        self._last = None  # (prompt, vector) of the latest lookup
+
+    def _load(self):
+        if self._embedder is not None:
+            return
+        try:
+            import faiss
+            from fastembed import TextEmbedding
+        except ImportError as e:
+            raise ImportError("Please install the semantic cache deps: pip install fastembed faiss-cpu") from e
+        import json
+        import numpy as np
+
+        self._embedder = TextEmbedding(SEM_MODEL)
+        try:
+            with open(self.path + ".faiss", "rb") as f:
+                blob = f.read()
+            with open(self.path + ".json") as f:
+                state = json.load(f)
+            if state["index"] != hashlib.sha256(blob).hexdigest():
+                return
+            entries = [tuple(e) for e in state["entries"]]
+            index = faiss.deserialize_index(np.frombuffer(blob, dtype="uint8").copy())
+        except (OSError, ValueError, KeyError, TypeError, RuntimeError):
+            return  # missing, torn or unreadable: start empty
+        if index.ntotal == len(entries):
+            self._index, self.entries = index, entries
+
+    def _embed(self, prompt):
+        import numpy as np
+
+        if self._last is not None and self._last[0] == prompt:
+            return self._last[1]
+        vec = np.asarray(next(iter(self._embedder.embed([prompt]))), dtype="float32")[None, :]
+        vec /= np.linalg.norm(vec, axis=1, keepdims=True)
+        self._last = (prompt, vec)
+        return vec
+
+    def get(self, model, prompt):
+        self._load()
+        vec = self._embed(prompt)
+        if self._index is None or self._index.ntotal == 0:
+            return None
+        scores, ids = self._index.search(vec, min(SEM_SEARCH_K, self._index.ntotal))
+        now = time.time()
+        for score, i in zip(scores[0], ids[0]):
+            if score < self.threshold:
+                break  # results are sorted by score
+            cached_model, _, response, expires = self.entries[i]
+            if cached_model == model and expires > now:
+                return response
+        return None
+
+    def _prune(self):
+        """Drop expired entries, then the oldest ones past max_entries."""
+        import numpy as np
+
+        now = time.time()
+        drop = [i for i, e in enumerate(self.entries) if e[3] <= now]
+        keep = [i for i in range(len(self.entries)) if self.entries[i][3] > now]
+        excess = len(keep) - self.max_entries
+        if excess > 0:
+            drop = sorted(drop + keep[:excess])
+        if drop:
+            self._index.remove_ids(np.asarray(drop, dtype="int64"))
+            dropped = set(drop)
+            self.entries = [e for i, e in enumerate(self.entries) if i not in dropped]
+
+    def set(self, model, prompt, response):
+        import faiss
+        import json
+
+        self._load()
+        vec = self._embed(prompt)
+        if self._index is None:
+            self._index = faiss.IndexFlatIP(vec.shape[1])
+        self._index.add(vec)
+        self.entries.append((model, prompt, response, time.time() + self.ttl))
+        self._prune()
+
+        blob = faiss.serialize_index(self._index).tobytes()
+        state = {"index": hashlib.sha256(blob).hexdigest(), "entries": self.entries}
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        _write_atomic(self.path + ".faiss", blob)
+        _write_atomic(self.path + ".json", json.dumps(state).encode())
+
+
+def _preamble(search=True):
+    """System instruction for the ER route (with search) or the small route."""
+    return SYSTEM_PREAMBLE if search else SMALL_PREAMBLE
+
+
+@functools.cache
+def _config(search=True):
+    """Request config, built once per route and shared by every prompt."""
+    from google.genai import types
+
+    tools = [
+        types.Tool(googleSearch=types.GoogleSearch()),
+    ] if search else None
+    return types.GenerateContentConfig(
+        system_instruction=_preamble(search),
+        tools=tools,
+    )
+
+
+def _approx_tokens(text):
+    return len(text) // 4
+
+
+class PromptTooLarge(ValueError):
+    """Prompt estimated over MODEL_CTX; raised before anything is uploaded."""
+
+
+def _check_size(prompt):
+    tokens = _approx_tokens(prompt)
+    if tokens > MODEL_CTX:
+        raise PromptTooLarge(
+            f"prompt is ~{tokens:,} tokens, over the {MODEL_CTX:,}-token "
+            "context window (use --force to send it anyway)"
         )
 
 
-def generate(client, prompt, use_vertex=False):
+def _route(prompt):
+    """Pick (model, use_search, reason) for `prompt` using cheap local heuristics."""
+    lowered = prompt.lower()
+    tokens = _approx_tokens(prompt)
+    if tokens > SMALL_MAX_TOKENS:
+        return MODEL, True, f"~{tokens} tokens"
+    for word in SEARCH_KEYWORDS + ER_KEYWORDS:
+        if word in lowered:
+            return MODEL, True, f"keyword '{word}'"
+    return MODEL_SMALL, False, f"short (~{tokens} tokens), no search/ER keywords"
+
+
+@functools.lru_cache(maxsize=1024)
+def _enc(text):
+    """UTF-8 encode a stream chunk; small recurring chunks hit the cache."""
+    return text.encode("utf-8", "replace")
+
+
+def _emit(out, text):
+    out.write(text.encode("utf-8", "replace"))
+    out.flush()
+
+
+class _FdOut:
+    """Binary sink writing straight to a file descriptor with os.write.
+
+    Skips the BufferedWriter layer: each batch from generate_async's writer
+    (WRITE_BATCH_BYTES / WRITE_BATCH_SECS) is one syscall. Handles short
+    writes and non-blocking descriptors.
+    """
+
+    def __init__(self, fd):
+        self.fd = fd
+
+    def write(self, data):
+        view = memoryview(data)
+        while view:
+            try:
+                written = os.write(self.fd, view)
+            except BlockingIOError:
+                select.select([], [self.fd], [])
+                continue
+            view = view[written:]
+
+    def flush(self):
+        pass
+
+
+def _stdout_sink():
+    """Raw fd writes when stdout is a pipe/file; the normal buffer on a terminal."""
+    sys.stdout.flush()  # keep earlier print() output ahead of raw writes
+    if sys.stdout.isatty():
+        return sys.stdout.buffer
+    return _FdOut(sys.stdout.fileno())
+
+
+async def generate_async(
+    client,
+    prompt,
+    use_vertex=False,
+    cache=None,
+    sem_cache=None,
+    out=None,
+    force_er=False,
+    verbose=False,
+    force=False,
+):
+    """Stream the answer for `prompt` to `out`, a binary sink (default: stdout).
+
+    With client=None the client is only created on a cache miss, so a hit
+    never loads the SDK.
+    """
+    import asyncio
+
+    if out is None:
+        out = _stdout_sink()
+    if not force:
+        # Fail locally instead of uploading the whole prompt just to get a 400
+        _check_size(prompt)
+    if force_er:
+        model, search, reason = MODEL, True, "--force-er"
+    else:
+        model, search, reason = _route(prompt)
+    if verbose:
+        print(f"[route] {model}{' + search' if search else ''}: {reason}", file=sys.stderr)
+
+    key = ResponseCache.key(model, prompt, TOOLS_SIGNATURE if search else "", _preamble(search))
+    hit = cache.get(key) if cache is not None else None
+    if hit is None and sem_cache is not None:
+        hit = sem_cache.get(model, prompt)
+    if hit is not None:
+        _emit(out, f"[{model} | cached]\n{hit}\n")
+        return
+    if client is None:
+        client = make_client(use_vertex)
+
+    from google.genai import types
+
     contents = [
         types.Content(
             role="user",
@@ -58,25 +472,512 @@ def generate(client, prompt, use_vertex=False):
             ],
         ),
     ]
-    tools = [
-        types.Tool(googleSearch=types.GoogleSearch()),
-    ]
-    generate_content_config = types.GenerateContentConfig(
-        tools=tools,
-    )
+    generate_content_config = _config(search)
 
     backend = f"Vertex AI ({LOCATION})" if use_vertex else "AI Studio"
-    print(f"[{MODEL} | {backend}]")
-    for chunk in client.models.generate_content_stream(
-        model=MODEL,
-        contents=contents,
-        config=generate_content_config,
-    ):
-        print(chunk.text, end="")
-    print()
+    _emit(out, f"[{model} | {backend}]\n")
 
+    # Network reads and terminal writes overlap: the stream feeds a queue
+    # that a separate writer task drains
+    queue = asyncio.Queue(maxsize=64)
+    parts = []
+
+    async def read_chunks():
+        try:
+            async for chunk in await client.aio.models.generate_content_stream(
+                model=model,
+                contents=contents,
+                config=generate_content_config,
+            ):
+                # .text is computed per access, and None on non-text events
+                text = chunk.text or ""
+                if not text:
+                    continue
+                parts.append(text)
+                await queue.put(text)
+        finally:
+            # End the writer however the stream ends; if the queue is full
+            # the writer is busy rather than waiting and is cancelled instead
+            try:
+                queue.put_nowait(None)
+            except asyncio.QueueFull:
+                pass
+
+    async def write_chunks():
+        # Coalesce chunks into one write + flush per WRITE_BATCH_BYTES or
+        # WRITE_BATCH_SECS, whichever comes first
+        loop = asyncio.get_running_loop()
+        buf = bytearray()
+        deadline = None
+
+        def drain():
+            data = bytes(buf)
+            buf.clear()  # before writing, so a failed write isn't retried below
+            out.write(data)
+            out.flush()
+
+        try:
+            while True:
+                try:
+                    # Not wait_for: on 3.11 it can swallow a cancel that lands as
+                    # get() completes, leaving this loop waiting forever
+                    async with asyncio.timeout_at(deadline):
+                        text = await queue.get()
+                except TimeoutError:
+                    text = ""
+                if text is None:
+                    break
+                if text:
+                    if not buf:
+                        deadline = loop.time() + WRITE_BATCH_SECS
+                    buf += _enc(text)
+                if buf and (len(buf) >= WRITE_BATCH_BYTES or loop.time() >= deadline):
+                    drain()
+                    deadline = None
+        finally:
+            # Also on failure or Ctrl-C: show what was received before it
+            if buf:
+                drain()
+
+    reader = asyncio.create_task(read_chunks())
+    writer = asyncio.create_task(write_chunks())
+    try:
+        # If either side fails (e.g. BrokenPipeError when piped into `head`),
+        # stop the other rather than leave it blocked on the queue
+        await asyncio.wait((reader, writer), return_when=asyncio.FIRST_EXCEPTION)
+    finally:
+        reader.cancel()
+        writer.cancel()
+        await asyncio.gather(reader, writer, return_exceptions=True)
+    for task in (writer, reader):
+        if not task.cancelled() and task.exception() is not None:
+            raise task.exception()
+    _emit(out, "\n")
+
+    response = "".join(parts)
+    if cache is not None:
+        cache.set(key, response)
+    if sem_cache is not None:
+        sem_cache.set(model, prompt, response)
+
+
+async def warm_up(client, timeout=WARM_UP_TIMEOUT):
+    """Open the async client's connection (DNS + TCP + TLS) before the first prompt.
+
+    Bounded, so a stalled request doesn't linger; the first prompt waits at
+    most WARM_UP_WAIT for it, then opens its own connection.
+    """
+    import asyncio
+
+    try:
+        await asyncio.wait_for(client.aio.models.get(model=MODEL), timeout)
+    except Exception:
+        pass
+
+
+async def ainput(prompt):
+    """input() that lets the event loop keep running while the user types.
+
+    Reads on a daemon thread so a pending read never blocks interpreter exit.
+    The thread can't be interrupted, so Ctrl-C here reaches the Runner and
+    ends the session; only prompt_toolkit's reader discards just the line.
+    """
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def read():
+        try:
+            result = input(prompt)
+        except BaseException as e:
+            loop.call_soon_threadsafe(future.set_exception, e)
+        else:
+            loop.call_soon_threadsafe(future.set_result, result)
+
+    threading.Thread(target=read, daemon=True).start()
+    return await future
+
+
+def _prompt_reader():
+    """Async line reader with persistent history.
+
+    Uses prompt_toolkit (editing, Ctrl-R search) when installed, else
+    readline-backed input().
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    try:
+        from prompt_toolkit import PromptSession
+        from prompt_toolkit.history import FileHistory
+    except ImportError:
+        try:
+            import readline
+        except ImportError:
+            return ainput
+        path = HISTORY_PATH + ".readline"  # readline's file format differs
+        try:
+            readline.read_history_file(path)
+        except OSError:
+            pass
+        atexit.register(readline.write_history_file, path)
+        return ainput
+    return PromptSession(history=FileHistory(HISTORY_PATH)).prompt_async
+
+
+async def _interruptible(coro):
+    """Await `coro`, letting Ctrl-C cancel just it rather than the whole session."""
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    task = asyncio.ensure_future(coro)
+    previous = signal.getsignal(signal.SIGINT)
+    try:
+        loop.add_signal_handler(signal.SIGINT, task.cancel)
+    except (NotImplementedError, RuntimeError):
+        return await task
+    try:
+        return await task
+    except asyncio.CancelledError:
+        if asyncio.current_task().cancelling():
+            raise
+        print("\n[interrupted]")
+    finally:
+        loop.remove_signal_handler(signal.SIGINT)
+        signal.signal(signal.SIGINT, previous)
+
+
+async def interactive(client, use_vertex=False, **options):
+    import asyncio
+
+    backend = f"Vertex AI ({LOCATION})" if use_vertex else "AI Studio"
+    print(f"Gemini Robotics ER — {backend}")
+    print("Type your prompt, or 'q' to quit.\n")
+    warm = asyncio.create_task(warm_up(client))
+    read = _prompt_reader()
+    while True:
+        try:
+            prompt = await read("prompt > ")
+        except KeyboardInterrupt:
+            continue  # prompt_toolkit: Ctrl-C discards the current line
+        except EOFError:
+            break
+        if prompt.lower() == "q":
+            break
+        if prompt.strip():
+            if not warm.done():
+                # Let a nearly finished warm-up land, but never hold the
+                # prompt longer than it would take to connect itself
+                await asyncio.wait((warm,), timeout=WARM_UP_WAIT)
+                warm.cancel()
+            try:
+                await _interruptible(generate_async(client, prompt, use_vertex, **options))
+            except PromptTooLarge as e:
+                print(f"ERROR: {e}", file=sys.stderr)
+            print()
+
+
+class _PrefixedOut:
+    """Binary sink that emits whole lines only, each tagged with `prefix`.
+
+    Lets concurrent batch streams share stdout without splitting lines.
+    """
+
+    def __init__(self, out, prefix):
+        self.out = out
+        self.prefix = prefix.encode("utf-8")
+        self.pending = b""
+
+    def write(self, data):
+        *lines, self.pending = (self.pending + data).split(b"\n")
+        if lines:
+            self.out.write(b"".join(self.prefix + line + b"\n" for line in lines))
+
+    def flush(self):
+        self.out.flush()
+
+    def close(self):
+        if self.pending:
+            self.write(b"\n")
+        self.flush()
+
+
+async def run_batch(client, prompts, concurrency=BATCH_CONCURRENCY, **options):
+    """Stream prompts concurrently over the one client connection, `concurrency` at a time.
+
+    Failed prompts are reported on stderr, and exit with status 1 once all are done.
+    """
+    import asyncio
+
+    out = _stdout_sink()
+    width = len(str(len(prompts)))
+    limit = asyncio.Semaphore(max(1, concurrency))
+    failed = 0
+
+    async def one(i, prompt):
+        nonlocal failed
+        async with limit:
+            sink = _PrefixedOut(out, f"[{i:>{width}}] ")
+            try:
+                await generate_async(client, prompt, out=sink, **options)
+            except Exception as e:
+                failed += 1
+                print(f"[{i:>{width}}] ERROR: {e}", file=sys.stderr)
+            finally:
+                sink.close()
+
+    await asyncio.gather(*(one(i, p) for i, p in enumerate(prompts, 1)))
+    if failed:
+        print(f"ERROR: {failed} of {len(prompts)} prompts failed", file=sys.stderr)
+        raise SystemExit(1)
+
+
+class _StreamOut:
+    """Binary-file facade over an asyncio StreamWriter, for generate_async(out=...).
+
+    Raises once the client has gone away, so the daemon stops streaming (and
+    paying for) a response nobody reads.
+    """
+
+    def __init__(self, writer):
+        self.writer = writer
+
+    def write(self, data):
+        if self.writer.is_closing():
+            raise ConnectionResetError("daemon client disconnected")
+        self.writer.write(data)
+
+    def flush(self):
+        pass
+
+
+def _daemon_fingerprint():
+    """Hash of the env-driven settings a daemon fixes at startup."""
+    import json
+
+    settings = [PROJECT, LOCATION, MODEL, MODEL_SMALL, MODEL_CTX, os.environ.get("GEMINI_API_KEY", "")]
+    return hashlib.sha256(json.dumps(settings).encode()).hexdigest()
+
+
+async def serve_daemon(path=DAEMON_SOCKET):
+    """Keep one client (and its warm connection) alive across CLI invocations."""
+    import json
+    import socket
+    import asyncio
+    import fcntl  # POSIX only, like the daemon
+
+    caches = {}
+    active = 0
+    last_used = time.monotonic()
+    fingerprint = _daemon_fingerprint()
+    retiring = False
+
+    async def handle(reader, writer):
+        nonlocal active, last_used, retiring
+        active += 1
+        out = _StreamOut(writer)
+        try:
+            request = json.loads(await reader.readline())
+            if request.get("config") != fingerprint:
+                # Started under a different environment: refuse with an empty
+                # reply (the caller runs in-process) and exit once idle, so the
+                # next call autostarts a daemon with the current settings
+                retiring = True
+                return
+            use_vertex = request.get("vertex", False)
+            try:
+                client = make_client(use_vertex)
+            except SystemExit:
+                out.write(DAEMON_ERROR + b"ERROR: daemon could not create a client (is GEMINI_API_KEY set?)\n")
+                return
+            cache = None
+            if request.get("cache"):
+                cache = caches.setdefault("exact", ResponseCache())
+            sem_cache = None
+            if request.get("sem_cache"):
+                sem_cache = caches.setdefault("sem", SemanticCache())
+                sem_cache.threshold = request.get("sem_threshold", SEM_THRESHOLD)
+            await generate_async(
+                client,
+                request["prompt"],
+                use_vertex,
+                cache,
+                sem_cache,
+                out,
+                force_er=request.get("force_er", False),
+                force=request.get("force", False),
+            )
+        except Exception as e:
+            if not writer.is_closing():
+                out.write(DAEMON_ERROR + f"ERROR: {e}\n".encode("utf-8", "replace"))
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass  # the client hung up first
+            active -= 1
+            last_used = time.monotonic()
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.stat(directory)
+    shared = info.st_mode & 0o022 and not info.st_mode & stat.S_ISVTX
+    if info.st_uid not in (0, os.getuid()) or shared:
+        # Its owner, or anyone if it's writable and not sticky, could swap
+        # the socket out from under us
+        print(f"ERROR: {directory} is not private to this user; set GEMINI_DAEMON_SOCKET")
+        raise SystemExit(1)
+    # Concurrent autostarts take turns here, so only one of them binds and
+    # none removes the socket of a daemon that is already serving
+    with open(path + ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+        except OSError:
+            pass  # nothing listening: a leftover socket file at most
+        else:
+            return  # another daemon is already serving
+        finally:
+            probe.close()
+        if os.path.lexists(path):
+            os.unlink(path)
+        # Bind with a private umask so the socket is never reachable by others,
+        # not even between bind() and a later chmod
+        umask = os.umask(0o077)
+        try:
+            server = await asyncio.start_unix_server(handle, path)
+        finally:
+            os.umask(umask)
+        inode = os.stat(path).st_ino
+    async with server:
+        try:
+            while active or (not retiring and time.monotonic() - last_used < DAEMON_IDLE_TIMEOUT):
+                await asyncio.sleep(1.0)
+        finally:
+            # Unlink while still listening, so a daemon started after we stop
+            # accepting never has its socket removed; and only our own socket,
+            # never one a newer daemon has bound since
+            try:
+                if os.stat(path).st_ino == inode:
+                    os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+
+def _daemon_is_ours(sock, path):
+    """True if the process behind `sock` runs as this user.
+
+    A socket planted at the path by another user would otherwise see every
+    prompt and could answer with anything.
+    """
+    import socket
+
+    if hasattr(socket, "SO_PEERCRED"):
+        creds = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+        return struct.unpack("3i", creds)[1] == os.getuid()
+    try:
+        return os.lstat(path).st_uid == os.getuid()
+    except OSError:
+        return False
+
+
+def _connect_daemon(path=DAEMON_SOCKET, wait=5.0):
+    """Connect to the daemon, starting it in the background if needed.
+
+    None if it can't be reached or isn't running as this user.
+    """
+    import socket
+    import subprocess
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except OSError:
+        pass
+    else:
+        if _daemon_is_ours(sock, path):
+            return sock
+        sock.close()
+        return None
+    # The daemon's own output goes to a log, so a failed start can be explained
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(DAEMON_LOG, "ab") as log:
+        proc = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--daemon"],
+            stdin=subprocess.DEVNULL,
+            stdout=log,
+            stderr=log,
+            start_new_session=True,
+        )
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        # Polled before connecting: a daemon that exits because another one
+        # already serves the path is still reachable below
+        exited = proc.poll() is not None
+        try:
+            sock.connect(path)
+        except OSError:
+            if exited:
+                break  # it won't come up; don't wait out the deadline
+            continue
+        if _daemon_is_ours(sock, path):
+            return sock
+        break
+    sock.close()
+    if proc.poll():
+        print(f"[daemon] failed to start (see {DAEMON_LOG}); running in-process", file=sys.stderr)
+    return None
+
+
+def generate_via_daemon(request):
+    """Stream an answer from the daemon; False if it couldn't be reached or refused.
+
+    An error reported by the daemon goes to stderr and exits with status 1,
+    as it would in-process.
+    """
+    import json
+
+    sock = _connect_daemon()
+    if sock is None:
+        return False
+    out = _stdout_sink()
+    replied = False
+    error = None
+    with sock:
+        sock.sendall(json.dumps({**request, "config": _daemon_fingerprint()}).encode() + b"\n")
+        # A served request always writes at least the model header or an error
+        while data := sock.recv(4096):
+            replied = True
+            if error is not None:
+                error += data
+                continue
+            data, sep, rest = data.partition(DAEMON_ERROR)
+            if data:
+                out.write(data)
+                out.flush()
+            if sep:
+                error = rest
+    if error is not None:
+        print(error.decode("utf-8", "replace"), end="", file=sys.stderr)
+        raise SystemExit(1)
+    return replied
+
+
+def _loop_factory():
+    """uvloop's event loop when installed (cheaper per-chunk scheduling), else asyncio's."""
+    try:
+        import uvloop
+    except ImportError:
+        return None
+    return uvloop.new_event_loop
+
+
+def _build_parser():
+    """Full argparse parser — only built for --help and malformed arguments."""
+    import argparse
 
-if __name__ == "__main__":
     parser = argparse.ArgumentParser(
         description="Gemini Robotics ER — embodied reasoning"
     )
@@ -91,23 +992,167 @@ if __name__ == "__main__":
         default=USE_VERTEX,
         help="Use Vertex AI instead of AI Studio (requires model availability)",
     )
-    args = parser.parse_args()
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Always call the model, even if GEMINI_CACHE=1 is set",
+    )
+    parser.add_argument(
+        "--sem-cache",
+        action="store_true",
+        help="Reuse cached answers for similar (paraphrased) prompts",
+    )
+    parser.add_argument(
+        "--sem-threshold",
+        type=float,
+        default=SEM_THRESHOLD,
+        help=f"Cosine similarity needed for a semantic cache hit (default: {SEM_THRESHOLD})",
+    )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help=f"Serve prompts from a long-lived process on {DAEMON_SOCKET}",
+    )
+    parser.add_argument(
+        "--batch",
+        metavar="FILE",
+        help="Run every line of FILE ('-' for stdin) as a prompt, concurrently",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=BATCH_CONCURRENCY,
+        metavar="N",
+        help=f"Most --batch prompts in flight at once (default: {BATCH_CONCURRENCY})",
+    )
+    parser.add_argument(
+        "--force-er",
+        action="store_true",
+        help=f"Always use {MODEL}; skip routing short prompts to {MODEL_SMALL}",
+    )
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        help="Log which model each prompt is routed to (on stderr)",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Send prompts even if they look larger than the context window",
+    )
+    return parser
 
-    client = make_client(args.vertex)
 
-    if args.prompt:
-        generate(client, " ".join(args.prompt), args.vertex)
-    else:
-        backend = f"Vertex AI ({LOCATION})" if args.vertex else "AI Studio"
-        print(f"Gemini Robotics ER — {backend}")
-        print("Type your prompt, or 'q' to quit.\n")
-        while True:
+# Fast-path parse: name -> attribute for on/off flags, and name -> (attribute,
+# converter) for options taking a value. Must mirror _build_parser().
+_FLAGS = {
+    "--vertex": "vertex",
+    "--no-cache": "no_cache",
+    "--sem-cache": "sem_cache",
+    "--daemon": "daemon",
+    "--force-er": "force_er",
+    "--verbose": "verbose",
+    "--force": "force",
+}
+_OPTIONS = {
+    "--sem-threshold": ("sem_threshold", float),
+    "--batch": ("batch", str),
+    "--concurrency": ("concurrency", int),
+}
+
+
+def parse_args(argv):
+    """Parse the CLI without importing argparse; defers to it for --help and errors."""
+    args = SimpleNamespace(
+        prompt=[],
+        vertex=USE_VERTEX,
+        no_cache=False,
+        sem_cache=False,
+        sem_threshold=SEM_THRESHOLD,
+        daemon=False,
+        batch=None,
+        concurrency=BATCH_CONCURRENCY,
+        force_er=False,
+        verbose=False,
+        force=False,
+    )
+    it = iter(argv)
+    for arg in it:
+        name, eq, value = arg.partition("=")
+        if arg == "--":
+            args.prompt.extend(it)
+        elif arg in _FLAGS:
+            setattr(args, _FLAGS[arg], True)
+        elif name in _OPTIONS:
+            attr, convert = _OPTIONS[name]
             try:
-                prompt = input("prompt > ")
-                if prompt.lower() == "q":
-                    break
-                if prompt.strip():
-                    generate(client, prompt, args.vertex)
-                    print()
-            except (EOFError, KeyboardInterrupt):
-                break
+                setattr(args, attr, convert(value if eq else next(it)))
+            except (StopIteration, ValueError):
+                return _build_parser().parse_args(argv)
+        elif arg.startswith("-") and arg != "-":
+            return _build_parser().parse_args(argv)
+        else:
+            args.prompt.append(arg)
+    return args
+
+
+if __name__ == "__main__":
+    args = parse_args(sys.argv[1:])
+
+    if args.daemon:
+        import asyncio
+
+        with asyncio.Runner(loop_factory=_loop_factory()) as runner:
+            runner.run(serve_daemon())
+        raise SystemExit(0)
+
+    if args.prompt and not args.force:
+        # Checked here too so daemon-routed prompts fail the same way
+        try:
+            _check_size(" ".join(args.prompt))
+        except PromptTooLarge as e:
+            print(f"ERROR: {e}", file=sys.stderr)
+            raise SystemExit(1)
+
+    # --verbose logs to this process's stderr, which the daemon can't reach
+    if args.prompt and USE_DAEMON and not args.verbose:
+        request = {
+            "prompt": " ".join(args.prompt),
+            "vertex": args.vertex,
+            "cache": USE_CACHE and not args.no_cache,
+            "sem_cache": args.sem_cache and not args.no_cache,
+            "sem_threshold": args.sem_threshold,
+            "force_er": args.force_er,
+            "force": args.force,
+        }
+        if generate_via_daemon(request):
+            raise SystemExit(0)
+
+    cache = ResponseCache() if USE_CACHE and not args.no_cache else None
+    sem_cache = SemanticCache(args.sem_threshold) if args.sem_cache and not args.no_cache else None
+    options = {
+        "use_vertex": args.vertex,
+        "cache": cache,
+        "sem_cache": sem_cache,
+        "force_er": args.force_er,
+        "verbose": args.verbose,
+        "force": args.force,
+    }
+
+    import asyncio
+
+    # One event loop for the whole session, so the async client's
+    # connection pool survives between prompts
+    with asyncio.Runner(loop_factory=_loop_factory()) as runner:
+        if args.batch:
+            with (sys.stdin if args.batch == "-" else open(args.batch)) as f:
+                prompts = [line.strip() for line in f if line.strip()]
+            runner.run(run_batch(make_client(args.vertex), prompts, args.concurrency, **options))
+        elif args.prompt:
+            # The client is created only if no cache has the answer
+            runner.run(generate_async(None, " ".join(args.prompt), **options))
+        else:
+            try:
+                runner.run(interactive(make_client(args.vertex), **options))
+            except KeyboardInterrupt:
+                pass